@@ -5,18 +5,39 @@
 ################################################################################
 
 
+import os
 import math
+import functools
 import numpy as np
 import scipy as sc
-import seaborn as sns
-import itertools as it
 import multiprocessing as mp
-import matplotlib.pyplot as plt
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import hgana.utils as utils
 
 from hgana.box import Box
-from hgana.mc import MC
+from hgana.mc import MC, warmup, seed
+
+
+@functools.lru_cache(maxsize=4)
+def _load_results(results_link, mtime):
+    """Load a results object and memoize it, so that back-to-back plot calls
+    on the same file do not unpickle it repeatedly.
+
+    Parameters
+    ----------
+    results_link : string
+        File link to results object
+    mtime : float
+        Modification time of the results file
+
+    Returns
+    -------
+    results : list
+        Loaded results object
+    """
+    return utils.load(results_link)
 
 
 class Adsorption(Box):
@@ -65,6 +86,45 @@ class Adsorption(Box):
         # Add new interaction matrix entry
         self._im[len(self._im)] = {idx: 0 for idx in self._mols.keys()}
 
+        im_arr = np.zeros((len(self._mols), len(self._mols)), dtype=np.float64)
+        im_arr[:self._im_arr.shape[0], :self._im_arr.shape[1]] = self._im_arr
+        self._im_arr = im_arr
+
+    def _enumerate_systems(self):
+        """Enumerate all possible systems as the Cartesian product of the
+        molecule numbers. Instead of materializing a list of tuples, the
+        product is built as a contiguous integer array using repeat and tile
+        operations.
+
+        Returns
+        -------
+        systems : ndarray
+            Integer array of shape (num_systems, num_mols) containing the
+            number of molecules of each type per system
+        """
+        # Convert molecule numbers to arrays
+        nums = [np.array(mol["num"], dtype=np.int32) for mol in self._mols.values()]
+
+        # Build Cartesian product column-wise
+        num_sys = int(np.prod([len(num) for num in nums]))
+        systems = np.empty((num_sys, len(nums)), dtype=np.int32)
+
+        reps = num_sys
+        for i, num in enumerate(nums):
+            reps //= len(num)
+            systems[:, i] = np.tile(np.repeat(num, reps), num_sys//(reps*len(num)))
+
+        return systems
+
+    def _setup_arrays(self):
+        """Cache the interaction matrix and molecule metadata as flat arrays.
+        These are invariant over a sweep and shared by every system, avoiding
+        per-system dictionary conversion.
+        """
+        n_types = len(self._mols)
+        self._im_arr = np.array([[self._im[i][j] for j in range(n_types)] for i in range(n_types)], dtype=np.float64)
+        self._is_move_arr = np.array([mol["is_move"] for mol in self._mols.values()], dtype=np.bool_)
+
     def _run_helper(self, size, systems, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj):
         """Run Monte Carlo algorithm.
 
@@ -72,8 +132,9 @@ class Adsorption(Box):
         ----------
         size : integer
             Number of cells
-        systems : list
-            List of system touples containing number of molecules of each type
+        systems : ndarray, list
+            Array of system rows containing the number of molecules of each
+            type
         temp : float
             Simulation temperature in Kelvin
         steps_equi : integer
@@ -100,18 +161,92 @@ class Adsorption(Box):
         res_dict = {}
 
         for system in systems:
-            # Set up system
-            box = Box(size)
-            for mol_id, mol in self._mols.items():
-                box.add_mol(system[mol_id], mol["is_move"], mol["name"], mol["struct"])
-            box.set_im(self._im)
-
-            # Run MC
-            mc = MC(box, temp)
-            res_dict[system] = mc.run(steps_equi, steps_prod, binding, pb_f, n_print, out, traj)
+            key, result = self._run_one(size, system, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj)
+            res_dict[key] = result
 
         return res_dict
 
+    def _run_one(self, size, system, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj):
+        """Run Monte Carlo algorithm for a single system.
+
+        Parameters
+        ----------
+        size : integer
+            Number of cells
+        system : ndarray, touple
+            System row containing the number of molecules of each type
+        temp : float
+            Simulation temperature in Kelvin
+        steps_equi : integer
+            Number of MC steps in the equilibration phase
+        steps_prod : integer
+            Number of MC steps in the production phase
+        binding : list, optional
+            Systems to calculate the binding probability for
+        pb_f : list, optional
+            Length and frequency of probability calculation list
+        n_print : integer, optional
+            Number of steps to print output for
+        out : list, optional
+            Probability output file link and frequency in steps
+        traj : list, optional
+            Trajectory output file link and frequency in steps
+
+        Returns
+        -------
+        result : tuple
+            System tuple and corresponding result dictionary
+        """
+        # Convert system row to tuple key
+        system = tuple(np.asarray(system).tolist())
+
+        # Set up system
+        box = Box(size)
+        for mol_id, mol in self._mols.items():
+            box.add_mol(system[mol_id], mol["is_move"], mol["name"], mol["struct"])
+        box.set_im(self._im)
+
+        # Seed the worker thread so parallel systems draw independent streams
+        seed(np.random.randint(2147483647))
+
+        # Run MC with the cached interaction matrix
+        mc = MC(box, temp, im=getattr(self, "_im_arr", None))
+        return system, mc.run(steps_equi, steps_prod, binding, pb_f, n_print, out, traj)
+
+    def _run_single(self, size, system, temp, steps_equi, steps_prod, binding, pb_f):
+        """Run Monte Carlo algorithm for a single system and binding pair and
+        return the mean binding probability. This is the specialized path used
+        by the optimization, skipping the result dictionary handling of the
+        batch helper.
+
+        Parameters
+        ----------
+        size : integer
+            Number of cells
+        system : touple
+            System containing the number of molecules of each type
+        temp : float
+            Simulation temperature in Kelvin
+        steps_equi : integer
+            Number of MC steps in the equilibration phase
+        steps_prod : integer
+            Number of MC steps in the production phase
+        binding : touple
+            Host and guest molecule to calculate the binding probability for
+        pb_f : list
+            Length and frequency of probability calculation list
+
+        Returns
+        -------
+        p_b : float
+            Mean binding probability
+        """
+        _, result = self._run_one(size, system, temp, steps_equi, steps_prod,
+                                  [{"host": binding[0], "guest": binding[1]}],
+                                  pb_f, 0, ["", 0], ["", 0])
+
+        return float(np.mean(result["p_b"][tuple(binding)]))
+
     def run(self, temp, steps_equi, steps_prod, out_link, binding=[{"host": 0, "guest": 1}], pb_f=[1000, 100], n_print=1000, out=["", 0], traj=["", 0], np=0, is_parallel=True):
         """Run Monte Carlo algorithm.
 
@@ -146,31 +281,39 @@ class Adsorption(Box):
             Dictionary of system and corresponding results
         """
         # Create all possible configurations
-        systems = list(it.product(*[x["num"] for x in self._mols.values()]))
+        systems = self._enumerate_systems()
+
+        # Cache molecule metadata as flat arrays - shared by every system
+        self._setup_arrays()
 
         # Run helper function
         if is_parallel:
-            # Get number of cores
-            np = np if np and np<=mp.cpu_count() else mp.cpu_count()
-
-            # Calculate number of systems per processor
-            sys_num = math.floor(len(systems)/np)
-
-            # Divide systems on processors
-            if sys_num==0:
-                sys_np = [[system] for system in systems]
-            else:
-                sys_np = [systems[sys_num*i:] if i == np-1 else systems[sys_num*i:sys_num*(i+1)] for i in range(np)]
-
-            # Run parallel search
-            pool = mp.Pool(processes=len(sys_np) if len(sys_np)<np else np)
-            results = [pool.apply_async(self._run_helper, args=(self._size, x, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj)) for x in sys_np]
+            # Get number of cores usable by this process - cpu_count reports
+            # all system cores regardless of cgroup or scheduler limits
+            try:
+                ncpu = len(os.sched_getaffinity(0))
+            except AttributeError:
+                ncpu = mp.cpu_count()
+
+            # Never spawn more workers than usable cores or systems
+            np = min(np if np else ncpu, ncpu, len(systems))
+
+            # Compile the MC kernels once before the workers start
+            warmup()
+
+            # Amortize task dispatch for large sweeps while keeping several
+            # tasks per worker for dynamic balancing
+            chunksize = max(1, len(systems)//(np*4))
+            chunks = [systems[i:i+chunksize] for i in range(0, len(systems), chunksize)]
+
+            # Run system chunks on a thread pool - the MC kernel releases the
+            # GIL, and idle threads pick up remaining chunks as they finish
             res_dict = {}
-            for res in results:
-                res_dict.update(res.get())
-
-            # Destroy object
-            del results
+            with ThreadPoolExecutor(max_workers=np) as pool:
+                results = {pool.submit(self._run_helper, self._size, chunk, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj) for chunk in chunks}
+                for res in as_completed(list(results)):
+                    res_dict.update(res.result())
+                    results.discard(res)
         else:
             res_dict = self._run_helper(self._size, systems, temp, steps_equi, steps_prod, binding, pb_f, n_print, out, traj)
 
@@ -222,20 +365,24 @@ class Adsorption(Box):
         size : integer
             Number of cells.
         """
+        # Cache molecule metadata as flat arrays
+        self._setup_arrays()
+
+        # Cache evaluations - Powell brackets the minimum over identical
+        # integer sizes repeatedly and each evaluation is a full MC run
+        cache = {}
+
         # Define helper function
         def difference(size):
             # Calculate p_b
-            size = int(size)
-            p_b = self._run_helper(size,
-                                   [system],
-                                   T,
+            size = int(np.ravel(size)[0])
+            if size in cache:
+                return cache[size]
+            p_b = self._run_single(size, system, T,
                                    steps_equi=int(1e3),
                                    steps_prod=steps_prod,
-                                   binding=[{"host": binding[0], "guest": binding[1]}],
-                                   pb_f=[steps_prod, 1],
-                                   n_print=0, out=["", 0], traj=["", 0])
-
-            p_b = np.mean(p_b[system]["p_b"][binding])
+                                   binding=binding,
+                                   pb_f=[steps_prod, 1])
 
             # p_b_2 = np.mean(self._run_helper(size*2,
             #                                  [system],
@@ -258,6 +405,8 @@ class Adsorption(Box):
             # diff = abs(p_b/(1-p_b)*(1-p_b_2)/p_b_2-2)
             print("size = "+"%5i"%size+", p_b = "+"%5.2f"%(p_b)+", p_b/p_u = "+"%5.2f"%(p_b/(1-p_b))+", diff = "+"%5.2f"%diff+", Vbox = "+"%5.2f"%Vbox)
 
+            cache[size] = diff
+
             return diff
 
         # Run minimization
@@ -281,12 +430,22 @@ class Adsorption(Box):
         p_b_id : touple
             Reults index of the p_b list
         """
+        # Import plotting libraries on demand, so simulation runs do not pay
+        # for them
+        import seaborn as sns
+        import matplotlib.pyplot as plt
+
         # Load results
-        res = utils.load(results_link)
+        res = _load_results(results_link, os.path.getmtime(results_link))
 
         # Get data
         mols = res[0].get_mols()
-        results = {key: val["p_b"] for key, val in res[1].items()}
+
+        # Group mean probabilities by the x and y molecule numbers - means are
+        # invariant per system and only needed once
+        by_xy = {}
+        for system, result in res[1].items():
+            by_xy.setdefault((system[mol_x], system[mol_y]), []).append(float(np.mean(result["p_b"][p_b_id])))
 
         y = mols[mol_y]["num"]
         y.sort()
@@ -295,9 +454,7 @@ class Adsorption(Box):
             x.sort()
             p_b = []
             for num_x in x:
-                for system, result in results.items():
-                    if system[mol_x] == num_x and system[mol_y] == num_y:
-                        p_b.append(np.mean(result[p_b_id]))
+                p_b += by_xy.get((num_x, num_y), [])
 
             sns.lineplot(x=x, y=p_b)
 
@@ -324,12 +481,15 @@ class Adsorption(Box):
         plot_dict : dictionary
             Dictionary with host number as keys and x, y lists as values
         """
+        if is_plot:
+            import seaborn as sns
+            import matplotlib.pyplot as plt
+
         # Load results
-        res = utils.load(results_link)
+        res = _load_results(results_link, os.path.getmtime(results_link))
 
         # Get data
         mols = res[0].get_mols()
-        results = {key: val["p_b"] for key, val in res[1].items()}
 
         # Get molecule numbers
         mol_x = val_x["mol_id"]
@@ -339,23 +499,28 @@ class Adsorption(Box):
         num_h = mols[mol_h]["num"]
         num_g = mols[mol_g]["num"]
 
+        # Group mean probabilities by the host and guest molecule numbers -
+        # each mean is computed once per system and probability id
+        by_hg = {}
+        for sys, result in res[1].items():
+            means = {p_b_id: float(np.mean(val)) for p_b_id, val in result["p_b"].items()}
+            by_hg.setdefault((sys[mol_h], sys[mol_g]), []).append(means)
+
         # Run through systems
         plot_dict = {}
         for i in num_h:
             x = []
             y = []
             for j in num_g:
-                for sys, result in results.items():
-                    if sys[mol_h] == i and sys[mol_g] == j:
-                        num_x = i if mol_x==mol_h else j
-                        num_y = i if mol_y==mol_h else j
-                        x.append(np.mean(result[val_x["p_b"]])*num_x if val_x["bu"]=="b" else ((1-np.mean(result[val_x["p_b"]]))*num_x))
-                        y.append(np.mean(result[val_y["p_b"]])*num_y if val_y["bu"]=="b" else ((1-np.mean(result[val_y["p_b"]]))*num_y))
-
-            # Sort
-            x.sort()
-            y.sort()
-            plot_dict[i] = [x, y]
+                for means in by_hg.get((i, j), []):
+                    num_x = i if mol_x==mol_h else j
+                    num_y = i if mol_y==mol_h else j
+                    x.append(means[val_x["p_b"]]*num_x if val_x["bu"]=="b" else ((1-means[val_x["p_b"]])*num_x))
+                    y.append(means[val_y["p_b"]]*num_y if val_y["bu"]=="b" else ((1-means[val_y["p_b"]])*num_y))
+
+            # Sort by x while preserving the x-y pairing
+            order = np.argsort(np.asarray(x))
+            plot_dict[i] = [np.asarray(x)[order].tolist(), np.asarray(y)[order].tolist()]
 
         # Plot
         if is_plot:
@@ -5,26 +5,114 @@
 ################################################################################
 
 
-import sys
 import math
-import random
 
 import numpy as np
 
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from numba import njit, prange
 
 import hgana.utils as utils
 
 
-def sample(file_link, out_link, conditions={1: [0, 0.7]}):
+@njit("int8[:](float64[:, :], int64[:], float64[:], float64[:])", cache=True, parallel=True)
+def _classify(data, cols, low, high):
+    """Classify each frame as bound or unbound by checking all conditions,
+    parallelized over frames without intermediate mask matrices.
+
+    Parameters
+    ----------
+    data : ndarray
+        Read data matrix
+    cols : ndarray
+        Matrix column of each condition
+    low : ndarray
+        Lower bound of each condition
+    high : ndarray
+        Upper bound of each condition
+
+    Returns
+    -------
+    state : ndarray
+        Bound (1) and unbound (0) state per frame
+    """
+    state = np.empty(data.shape[0], dtype=np.int8)
+
+    # Run through frames
+    for i in prange(data.shape[0]):
+        val = 1
+        for j in range(cols.size):
+            x = data[i, cols[j]]
+            if x < low[j] or x > high[j]:
+                val = 0
+                break
+        state[i] = val
+
+    return state
+
+
+@njit("Tuple((int64[:], int64[:]))(int8[:])", cache=True, parallel=True)
+def _rle(state):
+    """Run-length encode the bound/unbound state series. The first frame does
+    not count towards the first instance.
+
+    The state changes are detected with a parallel scan over the frames,
+    which scales with the number of cores; only the short merge over the
+    detected runs remains serial. The eager signature compiles the kernel at
+    import time into the disk cache, so runs pay no JIT overhead.
+
+    Parameters
+    ----------
+    state : ndarray
+        Bound (1) and unbound (0) state per frame
+
+    Returns
+    -------
+    runs : tuple
+        Bound and unbound dwell counts
+    """
+    n = state.size
+
+    # Detect state changes in parallel
+    is_new = np.empty(n, dtype=np.bool_)
+    is_new[0] = False
+    for i in prange(1, n):
+        is_new[i] = state[i] != state[i-1]
+    bounds = np.where(is_new)[0]
+
+    # Merge the run boundaries serially - since runs strictly alternate, each
+    # state holds at most half of them
+    num_runs = bounds.size+1
+    runs_b = np.empty((num_runs+1)//2, dtype=np.int64)
+    runs_u = np.empty((num_runs+1)//2, dtype=np.int64)
+    n_b = 0
+    n_u = 0
+
+    start = 0
+    for j in range(num_runs):
+        end = bounds[j] if j < bounds.size else n
+        length = end-start-1 if j == 0 else end-start
+        if state[start]:
+            runs_b[n_b] = length
+            n_b += 1
+        else:
+            runs_u[n_u] = length
+            n_u += 1
+        start = end
+
+    return runs_b[:n_b].copy(), runs_u[:n_u].copy()
+
+
+def sample(file_link, out_link, conditions={1: [0, 0.7]}, hist_max=0):
     """This function samples the bound and unbound instance of a molecule and
     cyclodextrin. The output, a data object, is then used to calculate the
     binding affinity using functions :func:`number` and :func:`time`.
 
     The data structure is a dictionary containing the counted instances over
-    the time periods.
+    the time periods. Optionally the instances can be binned into a histogram
+    of dwelling times, which bounds the object size for long trajectories.
+    Instances longer than the histogram are counted in the last bin.
 
     Parameters
     ----------
@@ -34,57 +122,41 @@ def sample(file_link, out_link, conditions={1: [0, 0.7]}):
         Link to output object file
     conditions : dictionary, optional
         Dictionary conditions to check - key: [min, max]
+    hist_max : integer, optional
+        Number of histogram bins for the dwelling times, zero to store the
+        raw instances
     """
-    # Initialize
-    counter = 0
-    series = {"b": [], "u": []}
-
-    data_old = []
-    state_old = None
-
-    # Extract data
-    with open(file_link, "r") as file_in:
-        # Run through frames
-        for frame_id, frame in enumerate(file_in):
-            # Remove comments
-            if not "#" in frame and not "@" in frame:
-                data = [float(x) if i>0 else int(x.split(".")[0]) for i, x in enumerate(frame.split())]
-                # Remove duplicates
-                if not data == data_old:
-                    # Process conditions
-                    is_in = 0
-                    for col, cond in conditions.items():
-                        if data[col] >= cond[0] and data[col] <= cond[1]:
-                            is_in += 1
-                    is_in = is_in==len(conditions)
-
-                    # Check state - remove first frame
-                    if state_old is not None:
-                        # Same state - (still bound/still unbound)
-                        if is_in == state_old:
-                            counter += 1
-                        # State changed
-                        else:
-                            # Add counter to time series
-                            series["b" if state_old else "u"].append(counter)
-                            # Reset counter
-                            counter = 1
-
-                # Save last frame
-                data_old = data
-                state_old = is_in
-
-            # Progress
-            if frame_id%100000 == 0:
-                sys.stdout.write("Finished frame "+"%7i"%(frame_id)+"...\r")
-                sys.stdout.flush()
-        print()
-
-        # Add last counter to list
-        series["b" if state_old else "u"].append(counter)
+    # Read only the time and condition columns of the COLVAR file - the C
+    # tokenizer skips the remaining fields entirely
+    usecols = sorted({0} | set(conditions.keys()))
+    data = utils.read_colvar(file_link, usecols)
+
+    # Remove duplicate frames based on the time column
+    t = data[:, usecols.index(0)]
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = t[1:] != t[:-1]
+    data = data[keep]
+
+    # Process conditions - stack bounds and classify all frames in the
+    # compiled kernel without intermediate mask matrices
+    cols = np.array([usecols.index(col) for col in conditions.keys()], dtype=np.int64)
+    low = np.array([cond[0] for cond in conditions.values()], dtype=np.float64)
+    high = np.array([cond[1] for cond in conditions.values()], dtype=np.float64)
+
+    is_in = _classify(data, cols, low, high)
+
+    # Determine run lengths of bound and unbound states
+    runs_b, runs_u = _rle(is_in)
+
+    # Bin the dwelling times if requested
+    if hist_max:
+        series = {"b": np.bincount(np.minimum(runs_b, hist_max-1), minlength=hist_max),
+                  "u": np.bincount(np.minimum(runs_u, hist_max-1), minlength=hist_max)}
+    else:
+        series = {"b": list(runs_b), "u": list(runs_u)}
 
     # Save data
-    utils.save({"inp": conditions, "series": series}, out_link)
+    utils.save({"inp": conditions, "hist_max": hist_max, "series": series}, out_link)
 
 
 def number(data_link, T, V):
@@ -122,25 +194,31 @@ def number(data_link, T, V):
 
     # Get data
     data = sample["series"]
+    hist_max = sample.get("hist_max", 0)
 
     # Calculate variables
-    RTs = {"kJ/mol": -8.314e-3*T, "kcal/mol": -1.986e-3*T}  # kJ/mol, kcal/mol
+    RT = np.array([-8.314e-3, -1.986e-3])*T  # kJ/mol, kcal/mol
     V0 = 1.661e-27  # m^3
 
-    N_b = sum(data["b"])
-    N_u = sum(data["u"])
+    if hist_max:
+        lengths = np.arange(hist_max)
+        N_b = lengths @ np.asarray(data["b"], dtype=np.int64)
+        N_u = lengths @ np.asarray(data["u"], dtype=np.int64)
+    else:
+        N_b = np.asarray(data["b"], dtype=np.int64).sum()
+        N_u = np.asarray(data["u"], dtype=np.int64).sum()
 
     log_V = np.log(V/V0)
     log_N = np.log(N_b/N_u) if N_u>0 else 0
 
-    # Calculate binding affinity
-    dG = {key: RT*log_N+RT*log_V for key, RT in RTs.items()}
+    # Calculate binding affinity for both unit systems at once
+    dG = dict(zip(["kJ/mol", "kcal/mol"], RT*log_N+RT*log_V))
 
     # Output
     return dG
 
 
-def time(data_link, T, V, dt, len_frame=1, is_std=False):
+def time(data_link, T, V, dt, len_frame=1, is_std=False, is_df=True):
     """This function calculates the binding affinity :math:`\\Delta G_T`.
     This is done by determining the association rate constant :math:`k_\\text{On}`
     and dissociation rate constant :math:`k_\\text{Off}`
@@ -219,8 +297,9 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
 
     Parameters
     ----------
-    data_link : string
-        Sampled affinity object
+    data_link : string, dictionary
+        Sampled affinity object or the already loaded data object, so
+        repeated cut-off evaluations skip the deserialization
     T : float
         Simulated temperature in :math:`\\text{K}`
     V : float
@@ -231,10 +310,13 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
         Length of a frame in ps
     is_std : bool, optional
         True to calculate standard deviation
+    is_df : bool, optional
+        True to return a pandas DataFrame, False for a plain dictionary so
+        cut-off sweeps can collect rows and build one DataFrame at the end
 
     Returns
     -------
-    table : DataFrame
+    table : DataFrame, dictionary
         Pandas DataFrame of binding affinity in :math:`\\frac{\\text{kJ}}{\\text{mol}}`
         and :math:`\\frac{\\text{kcal}}{\\text{mol}}`,
         :math:`k_\\text{On}` in :math:`\\frac{1}{\\text{s}}` and
@@ -243,7 +325,7 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
         the standard deviations of these values
     """
     # Load data object
-    sample = utils.load(data_link)
+    sample = data_link if isinstance(data_link, dict) else utils.load(data_link)
 
     # Get data
     data = sample["series"]
@@ -254,13 +336,20 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
     RTs = {"kJ/mol": -8.314e-3*T, "kcal/mol": -1.986e-3*T}  # kJ/mol, kcal/mol
     log_V = np.log(V/V0)
 
-    # Apply cuttoff
+    # Apply cuttoff - binned dwelling times are expanded after dropping the
+    # bins below the cut-off
     d_frames = round(dt/len_frame)
-    data = {x: [y for y in data[x] if y >= d_frames] for x in data}
+    hist_max = sample.get("hist_max", 0)
+    if hist_max:
+        lengths = np.arange(d_frames, hist_max)
+        data = {x: np.repeat(lengths, np.asarray(data[x], dtype=np.int64)[d_frames:]) for x in data}
+    else:
+        data = {x: np.asarray(data[x], dtype=np.int64) for x in data}
+        data = {x: data[x][data[x] >= d_frames] for x in data}
 
     # Calculate mean time value
-    t_b = np.mean(data["b"])*10e-12
-    t_u = np.mean(data["u"])*10e-12
+    t_b = data["b"].mean()*1e-11
+    t_u = data["u"].mean()*1e-11
 
     # Calculate binding affinity
     log_t = np.log(t_b/t_u) if t_u>0 else 0
@@ -273,16 +362,23 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
         # Initialize
         ratio = 0.8
         num_std = 300
-        num_entry = {key: math.floor(ratio*len(val)) for key, val in data.items()}
 
-        # Generate permutations
-        t_std = {key: [np.mean(random.sample(val, num_entry[key])) for i in range(num_std)] for key, val in data.items()}
-
-        # Calculate standard deviation
-        log_t_std = [np.log(t_std["b"][i]/t_std["u"][i]) for i in range(num_std) if t_std["u"][i]>0]
-        k_on_std = np.std([V/t_std["u"][i]*NA*1e3 for i in range(num_std) if t_std["u"][i]>0])
-        k_off_std = np.std([1/t_std["b"][i] for i in range(num_std)])
-        dG_std = {key: np.std([RT*log_t_std[i]+RT*log_V for i in range(num_std)]) for key, RT in RTs.items()}
+        # Generate permutations - shuffle index rows in one batch, take the
+        # leading sample of each row and reduce the sample matrix row-wise
+        rng = np.random.default_rng()
+        t_std = {}
+        for key, val in data.items():
+            num_entry = math.floor(ratio*val.size)
+            vals = np.asarray(val, dtype=np.float64)
+            idx = rng.permuted(np.broadcast_to(np.arange(vals.size), (num_std, vals.size)), axis=1)[:, :num_entry]
+            t_std[key] = vals[idx].mean(axis=1)
+
+        # Calculate standard deviation - one vector expression per quantity
+        safe = t_std["u"] > 0
+        log_t_std = np.log(t_std["b"][safe]/t_std["u"][safe])
+        k_on_std = np.std(V/t_std["u"][safe]*NA*1e3)
+        k_off_std = np.std(1/t_std["b"])
+        dG_std = {key: np.std(RT*log_t_std+RT*log_V) for key, RT in RTs.items()}
 
     # Initialize output variable
     output = [dt]
@@ -301,7 +397,7 @@ def time(data_link, T, V, dt, len_frame=1, is_std=False):
             idx.append(names[i]+"_std ("+units[i]+")")
 
     # Return table
-    return pd.DataFrame([output], columns=idx)
+    return pd.DataFrame([output], columns=idx) if is_df else dict(zip(idx, output))
 
 
 def double_decoupling(temp, dG_hydr, dG_host, restraints, forces={"K_r": 500, "K_theta_A" : 50, "K_theta_B" : 50, "K_phi_A" : 50, "K_phi_B" : 50, "K_phi_C" : 50}):
@@ -390,33 +486,25 @@ def plot_time(link_colvar, com, dt=100, kwargs={}):
     kwargs: dict, optional
         Dictionary with plotting parameters (only for given intent)
     """
-    # Extract data
-    with open(link_colvar, "r") as file_in:
-        state = []
-        data_old = None
-
-        # Run through frames
-        for frame_id, frame in enumerate(file_in):
-            if not "#" in frame and not "@" in frame:
-                data = [float(x) if i>0 else int(x.split(".")[0]) for i, x in enumerate(frame.split())]
-
-                # Remove duplicates
-                if not data == data_old:
-                    if frame_id%dt == 0:
-                        state.append(int(data[com[0]] < com[1]))
+    # Import plotting libraries on demand, so analysis runs do not pay for them
+    import seaborn as sns
+    import matplotlib.pyplot as plt
 
-                    # Save last frame
-                    data_old = data
+    # Read only the time and centre of mass columns of the COLVAR file
+    usecols = sorted({0, com[0]})
+    data = utils.read_colvar(link_colvar, usecols)
 
-            # Progress
-            if frame_id%100000 == 0:
-                sys.stdout.write("Finished frame "+"%7i" % (frame_id)+"...\r")
-                sys.stdout.flush()
+    # Remove duplicate frames based on the time column
+    t = data[:, usecols.index(0)]
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = t[1:] != t[:-1]
+    data = data[keep]
 
-        print()
+    # Sample every dt frames and determine the state
+    state = (data[::dt, usecols.index(com[0])] < com[1]).astype(np.int8)
 
-        sns.lineplot(x=[x*dt/1000000 for x in range(len(state))], y=state, **kwargs)
+    sns.lineplot(x=np.arange(len(state))*dt/1000000, y=state, **kwargs)
 
-        # Set labels
-        plt.xlabel(r"Time ($\mu$s)")
-        plt.ylabel("State (Bound - 1, Unbound - 0)")
+    # Set labels
+    plt.xlabel(r"Time ($\mu$s)")
+    plt.ylabel("State (Bound - 1, Unbound - 0)")
@@ -5,6 +5,9 @@
 ################################################################################
 
 
+import numpy as np
+
+
 class Box:
     """This class creates a hypothetical simulation box, to which molecules are
     added. Interaction of molecules are defined using an interaction matrix.
@@ -21,6 +24,13 @@ class Box:
         self._im = {}
         self._free = size #[0]*size[1]*size[2]
 
+        # Per-molecule property arrays and dense interaction matrix - kept in
+        # sync with the dictionaries so the simulation can consume contiguous
+        # memory
+        self._num_arr = np.zeros(0, dtype=np.int32)
+        self._is_move_arr = np.zeros(0, dtype=np.bool_)
+        self._im_arr = np.zeros((0, 0), dtype=np.float64)
+
     def add_mol(self, num, is_move=True, name="", struct=""):
         """Add a molecule to the system. The interaction matrix is set up and
         filled with empty values.
@@ -50,10 +60,16 @@ class Box:
 
         # Add new molecule
         self._mols[len(self._mols)] = {"num": num, "is_move": is_move, "name": name, "struct": struct}
+        self._num_arr = np.append(self._num_arr, np.int32(num))
+        self._is_move_arr = np.append(self._is_move_arr, is_move)
 
         # Add new interaction matrix entry
         self._im[len(self._im)] = {idx: 0 for idx in self._mols.keys()}
 
+        im_arr = np.zeros((len(self._mols), len(self._mols)), dtype=np.float64)
+        im_arr[:self._im_arr.shape[0], :self._im_arr.shape[1]] = self._im_arr
+        self._im_arr = im_arr
+
 
     ##################
     # Setter Methods #
@@ -67,6 +83,7 @@ class Box:
             Interaction matrix
         """
         self._im = im
+        self._im_arr = np.array([[im[i][j] for j in sorted(im[i].keys())] for i in sorted(im.keys())], dtype=np.float64)
 
     def set_interaction(self, mol_a, mol_b, val):
         """Add interaction parameter between two molecules.
@@ -82,6 +99,8 @@ class Box:
         """
         self._im[mol_a][mol_b] = val
         self._im[mol_b][mol_a] = val
+        self._im_arr[mol_a, mol_b] = val
+        self._im_arr[mol_b, mol_a] = val
 
 
     ##################
@@ -117,6 +136,16 @@ class Box:
         """
         return self._mols
 
+    def get_mol_arrays(self):
+        """Return the per-molecule property arrays.
+
+        Returns
+        -------
+        arrays : touple
+            Molecule number array and mobility array
+        """
+        return self._num_arr, self._is_move_arr
+
     def get_num(self, idx):
         """Return the molecule number.
 
@@ -172,6 +201,16 @@ class Box:
         """
         return self._im
 
+    def get_im_array(self):
+        """Return the dense interaction matrix.
+
+        Returns
+        -------
+        im : ndarray
+            Dense interaction matrix
+        """
+        return self._im_arr
+
     def get_interaction(self, mol_a, mol_b):
         """Return the interaction parameter between to molecules.
 
@@ -5,12 +5,18 @@
 ################################################################################
 
 
+import io
 import os
-import sys
+import mmap
 import shutil
+import subprocess
 import numpy as np
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+
+import hgana.utils as utils
+
 
 def convert_gro(time, out_link):
     """Convert trr to gro at specified time using gromacs.
@@ -22,7 +28,9 @@ def convert_gro(time, out_link):
     out_link : string
         Link to output file
     """
-    if shutil.which("gmx_mpi"): os.system("gmx_mpi trjconv -f run.trr -s run.tpr -o "+out_link+" -dump "+str(time)+" >> /dev/null 2>&1 <<EOF\n0\nEOF\n")
+    if shutil.which("gmx_mpi"):
+        subprocess.run(["gmx_mpi", "trjconv", "-f", "run.trr", "-s", "run.tpr", "-o", out_link, "-dump", str(time)],
+                       input="0\n", capture_output=True, text=True)
 
 
 def complex(file_link, out_link=".", dt=2000, conditions={1: [0.0, 0.5], 2: [0.2, 0.4]}, num=0):
@@ -46,47 +54,74 @@ def complex(file_link, out_link=".", dt=2000, conditions={1: [0.0, 0.5], 2: [0.2
     struct : dictionary
         Dictionary of all output structures with values for the conditions - time: [cond 1, ...]
     """
-    # Run through COLVAR
+    # Read only the time and condition columns of the COLVAR file - with a
+    # limited output count the file is streamed in chunks, which bounds the
+    # memory for files larger than RAM and exits once enough frames matched
+    usecols = sorted({0} | set(conditions.keys()))
+    col_ids = {col: usecols.index(col) for col in conditions.keys()}
+
+    if num:
+        # The tokenizer only knows one comment character, so xvg style '@'
+        # lines are stripped before chunked parsing, matching utils.read_colvar
+        # on the unlimited path
+        with open(file_link, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = None if mm.find(b"@") == -1 else b"".join(line for line in mm[:].splitlines(keepends=True) if not b"@" in line)
+
+        source = io.BytesIO(data) if data is not None else file_link
+        chunks = pd.read_csv(source, sep=r"\s+", comment="#", header=None, usecols=usecols, dtype=np.float64, chunksize=1000000)
+    else:
+        chunks = [utils.read_colvar(file_link, usecols)]
+
+    # Run through chunks
     structs = {}
-    num_convert = 0
-    with open(file_link, "r") as file_in:
-        for line in file_in:
-            if not "#" in line and not "@" in line:
-                time = int(line.split()[0].split(".")[0])
-                line_data = [float(x) for x in line.split()]
-                # Check time
-                if time % dt == 0:
-                    # Apply conditions
-                    is_convert = 0
-                    for col, cond in conditions.items():
-                        if line_data[col] >= cond[0] and line_data[col] <= cond[1]:
-                            is_convert += 1
-                    if is_convert==len(conditions):
-                        # Set output name
-                        out_name = out_link
-                        out_name += "/" if not out_link[-1]=="/" else ""
-                        out_name += "complex_"
-                        for col in conditions.keys():
-                            out_name += "%i"%col+"_"
-                            out_name += "%.2f"%line_data[col]+"_"
-                        out_name += str(time).zfill(7)+"ps.gro"
-
-                        # Convert
-                        convert_gro(time, out_name)
-                        structs[time] = []
-                        for col in conditions.keys():
-                            structs[time].append(line_data[col])
-
-                        # Check number of conversions
-                        num_convert += 1
-                        if num and num_convert==num:
-                            break
-
-                # Progress
-                if time % 100000 == 0:
-                    sys.stdout.write("Finished frame "+"%7i"%time+"...\r")
-                    sys.stdout.flush()
-        print()
+    tasks = []
+    for chunk in chunks:
+        data = np.asarray(chunk)
+
+        # Evaluate the time step and all conditions as one boolean mask - the
+        # time column is cast to integers in a single vectorized pass
+        times = data[:, usecols.index(0)].astype(np.int64)
+        is_convert = times % dt == 0
+        for col, cond in conditions.items():
+            vals = data[:, col_ids[col]]
+            is_convert &= (vals >= cond[0]) & (vals <= cond[1])
+
+        # Run through matching frames - limit the number of conversions
+        idxs = np.flatnonzero(is_convert)
+        if num:
+            idxs = idxs[:num-len(structs)]
+
+        for idx in idxs:
+            time = int(times[idx])
+
+            # Set output name
+            out_name = out_link
+            out_name += "/" if not out_link[-1]=="/" else ""
+            out_name += "complex_"
+            for col in conditions.keys():
+                out_name += "%i"%col+"_"
+                out_name += "%.2f"%data[idx, col_ids[col]]+"_"
+            out_name += str(time).zfill(7)+"ps.gro"
+
+            # Collect conversion task
+            tasks.append((time, out_name))
+            structs[time] = [data[idx, col_ids[col]] for col in conditions.keys()]
+
+        # Check number of conversions
+        if num and len(structs)==num:
+            break
+
+    # Convert collected frames in parallel - each call spawns an independent
+    # gromacs process
+    if tasks:
+        try:
+            ncpu = len(os.sched_getaffinity(0))
+        except AttributeError:
+            ncpu = os.cpu_count()
+        with ThreadPoolExecutor(max_workers=min(len(tasks), ncpu)) as pool:
+            for task in tasks:
+                pool.submit(convert_gro, *task)
 
     return structs
 
@@ -111,54 +146,46 @@ def restraints(file_link, out_link="restraints.top", conditions={1: [0.0, 0.7]},
     restraints : dictionary
         dictionary containing the restraints with names and values
     """
-    # Run through COLVAR data
-    with open(file_link, "r") as file_in:
-        data = []
-        for line in file_in:
-            if not "#" in line and not "@" in line:
-                # Covert data
-                line_data = [float(x) for x in line.split()]
-
-                # Filter data
-                is_add = 0
-                for col, cond in conditions.items():
-                    if line_data[col] >= cond[0] and line_data[col] <= cond[1]:
-                        is_add += 1
-                if is_add==len(conditions):
-                    data.append(line_data)
-
-    df = pd.DataFrame(data)
-    df.columns = ["time", "d1", "d2", "d3", "a1", "r_aA", "theta_A", "theta_B", "phi_A", "phi_B", "phi_C"]
-
-    # Extract distances and angles
-    restraints = {"r_aA": {}, "theta_A": {}, "theta_B": {}, "phi_A": {}, "phi_B": {}, "phi_C": {}}
-
-    for restraint in restraints:
-        rest_data = df[restraint] if restraint=="r_aA" else [x*180/np.pi for x in df[restraint]]
-        restraints[restraint] = round(np.mean(rest_data), 2)
-
-    # Write to output file
-    a = {atom_name: "%3i"%atom_id for atom_name, atom_id in atom_list.items()}
-    d = {name: "%6.2f"%val for name, val in restraints.items()}
+    # Read COLVAR data in one pass
+    data = utils.read_colvar(file_link)
+
+    # Filter data with one boolean mask over all conditions
+    mask = np.ones(len(data), dtype=bool)
+    for col, cond in conditions.items():
+        mask &= (data[:, col] >= cond[0]) & (data[:, col] <= cond[1])
+    data = data[mask]
+
+    # Extract distances and angles - angles are scaled to degrees, the
+    # distance keeps a unit scale
+    to_deg = 180/np.pi
+    cols = {"r_aA": 5, "theta_A": 6, "theta_B": 7, "phi_A": 8, "phi_B": 9, "phi_C": 10}
+    scale = np.array([1.0, to_deg, to_deg, to_deg, to_deg, to_deg])
+
+    means = data[:, list(cols.values())].mean(axis=0)*scale
+    restraints = {name: round(mean, 2) for name, mean in zip(cols.keys(), means)}
+
+    # Write to output file - one formatted string per line
+    a = atom_list
+    d = restraints
 
     with open(out_link, "w") as file_out:
         file_out.write("[ intermolecular_interactions ]\n")
         file_out.write("[ bonds ]\n")
         file_out.write("; ai   aj   type  bA    kA   bB    kB\n")
-        file_out.write("   "+a["a"]+"  "+a["A"]+"  6     "+d["r_aA"]+"  0.0  "+d["r_aA"]+"  500\n")
+        file_out.write(f"   {a['a']:3d}  {a['A']:3d}  6     {d['r_aA']:6.2f}  0.0  {d['r_aA']:6.2f}  500\n")
         file_out.write("\n")
 
         file_out.write("[ angles ]\n")
         file_out.write("; ai   aj   ak   type  thA    fcA  thB    fcB\n")
-        file_out.write("   "+a["b"]+"  "+a["a"]+"  "+a["A"]+"  1     "+d["theta_A"]+"  0.0  "+d["theta_A"]+"  50.0\n")
-        file_out.write("   "+a["a"]+"  "+a["A"]+"  "+a["B"]+"  1     "+d["theta_B"]+"  0.0  "+d["theta_B"]+"  50.0\n")
+        file_out.write(f"   {a['b']:3d}  {a['a']:3d}  {a['A']:3d}  1     {d['theta_A']:6.2f}  0.0  {d['theta_A']:6.2f}  50.0\n")
+        file_out.write(f"   {a['a']:3d}  {a['A']:3d}  {a['B']:3d}  1     {d['theta_B']:6.2f}  0.0  {d['theta_B']:6.2f}  50.0\n")
         file_out.write("\n")
 
         file_out.write("[ dihedrals ]\n")
         file_out.write("; ai    aj   ak   al   type  thA     fcA  thB     fcB\n")
-        file_out.write("   "+a["c"]+"  "+a["b"]+"  "+a["a"]+"  "+a["A"]+"  2     "+d["phi_A"]+"  0.0  "+d["phi_A"]+"  50.0\n")
-        file_out.write("   "+a["b"]+"  "+a["a"]+"  "+a["A"]+"  "+a["B"]+"  2     "+d["phi_B"]+"  0.0  "+d["phi_B"]+"  50.0\n")
-        file_out.write("   "+a["a"]+"  "+a["A"]+"  "+a["B"]+"  "+a["C"]+"  2     "+d["phi_C"]+"  0.0  "+d["phi_C"]+"  50.0\n\n\n")
+        file_out.write(f"   {a['c']:3d}  {a['b']:3d}  {a['a']:3d}  {a['A']:3d}  2     {d['phi_A']:6.2f}  0.0  {d['phi_A']:6.2f}  50.0\n")
+        file_out.write(f"   {a['b']:3d}  {a['a']:3d}  {a['A']:3d}  {a['B']:3d}  2     {d['phi_B']:6.2f}  0.0  {d['phi_B']:6.2f}  50.0\n")
+        file_out.write(f"   {a['a']:3d}  {a['A']:3d}  {a['B']:3d}  {a['C']:3d}  2     {d['phi_C']:6.2f}  0.0  {d['phi_C']:6.2f}  50.0\n\n\n")
 
     return restraints
 
@@ -181,31 +208,25 @@ def filter(link_colvar, column, conditions={2: {1: [0, 0.7]}}, dt=1):
     Returns
     -------
     data : dictionary
-        Filtered data columns
+        Filtered data columns as arrays
     """
     # Process user input
     columns = column if isinstance(column, list) else [column]
 
-    # Extract data
-    data = {x: [] for x in columns}
-    with open(link_colvar, "r") as file_in:
-        # Run through file
-        for frame_id, frame in enumerate(file_in):
-            # Apply dt
-            if frame_id%dt == 0:
-                # Remove comments
-                if not "#" in frame and not "@" in frame:
-                    line_data = [float(x) for x in frame.split()]
-                    # Run through requested columns
-                    for column in columns:
-                        is_append = 0
-                        # Check conditions
-                        if column in conditions.keys():
-                            for col, cond in conditions[column].items():
-                                if line_data[col] >= cond[0] and line_data[col] <= cond[1]:
-                                    is_append += 1
-                        # Append
-                        if not column in conditions.keys() or is_append==len(conditions[column]):
-                            data[column].append(line_data[column])
+    # Read COLVAR and sample every dt frames
+    data_mat = utils.read_colvar(link_colvar)[::dt]
+
+    # Run through requested columns - apply the conditions of each column as
+    # one boolean mask and keep the result as an array, so subsequent binning
+    # runs in one pass over contiguous memory
+    data = {}
+    for column in columns:
+        vals = data_mat[:, column]
+        if column in conditions.keys():
+            mask = np.ones(len(data_mat), dtype=bool)
+            for col, cond in conditions[column].items():
+                mask &= (data_mat[:, col] >= cond[0]) & (data_mat[:, col] <= cond[1])
+            vals = vals[mask]
+        data[column] = vals
 
     return data
@@ -1,33 +1,392 @@
 ################################################################################
 # MC Class                                                                     #
 #                                                                              #
-"""Monte Carlo algorithm for calculating occupation probability."""
+"""Monte Carlo algorithm for calculating occupation probability. The step
+loop runs in disk-cached Numba kernels over packed state arrays."""
 ################################################################################
 
 
 import sys
-import random
 import numpy as np
 
+from numba import njit, prange
+
+
+KB = 8.314e-3  # kJ/mol/K
+
+
+@njit(cache=True, nogil=True, fastmath=True, boundscheck=False, error_model="numpy")
+def _metropolis_njit(dE, beta):
+    """Performs the acceptance criterion of the Metropolis–Hastings algorithm
+    within the compiled kernel.
+
+    Parameters
+    ----------
+    dE : float
+        The difference in energy between the new and old state
+    beta : float
+        Inverse temperature in mol/kJ
+
+    Returns
+    -------
+    accepted : bool
+        True if move is accepted
+    """
+    # Check metropolis - downhill moves skip the random draw, uphill moves
+    # use the equivalent log-form of the acceptance probability
+    if dE <= 0:
+        return True
+    else:
+        return np.log(np.random.random()) < -beta*dE
+
+
+@njit(cache=True, nogil=True, fastmath=True, boundscheck=False, error_model="numpy")
+def _count_bound(host, guest, inst_mol, inst_cell, cell_slots, cell_count, type_inst, type_num):
+    """Count the fraction of host instances bound to a guest molecule.
+
+    Parameters
+    ----------
+    host : integer
+        Host molecule type
+    guest : integer
+        Guest molecule type
+    inst_mol : ndarray
+        Molecule type of each molecule instance
+    inst_cell : ndarray
+        Current cell of each molecule instance
+    cell_slots : ndarray
+        Instance indices occupying each cell, -1 for empty slots
+    cell_count : ndarray
+        Number of instances in each cell
+    type_inst : ndarray
+        Instance indices of each molecule type
+    type_num : ndarray
+        Number of instances of each molecule type
+
+    Returns
+    -------
+    p_b : float
+        Bound fraction of host molecules
+    """
+    val = 0
+    for k in range(type_num[host]):
+        cell = inst_cell[type_inst[host, k]]
+        if cell_count[cell] == 2:
+            t_a = inst_mol[cell_slots[cell, 0]]
+            t_b = inst_mol[cell_slots[cell, 1]]
+            if t_a == guest or t_b == guest:
+                val += 1
+
+    return val/type_num[host]
+
+
+@njit(cache=True, nogil=True, fastmath=True, boundscheck=False, error_model="numpy")
+def _run_steps(steps, step_0, steps_tot,
+               inst_mol, inst_cell, cell_slots, cell_count,
+               type_inst, type_num, move_list, im, beta,
+               pairs, pb_len, pb_freq, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq):
+    """Run a segment of Monte Carlo steps on the packed box state. The state
+    arrays are modified in place so consecutive segments continue the same
+    trajectory.
+
+    Parameters
+    ----------
+    steps : integer
+        Number of MC steps in this segment
+    step_0 : integer
+        Phase step index of the first step in this segment
+    steps_tot : integer
+        Total number of MC steps in the phase
+    inst_mol : ndarray
+        Molecule type of each molecule instance
+    inst_cell : ndarray
+        Current cell of each molecule instance
+    cell_slots : ndarray
+        Instance indices occupying each cell, -1 for empty slots
+    cell_count : ndarray
+        Number of instances in each cell
+    type_inst : ndarray
+        Instance indices of each molecule type
+    type_num : ndarray
+        Number of instances of each molecule type
+    move_list : ndarray
+        Movable molecule types
+    im : ndarray
+        Dense interaction matrix
+    beta : float
+        Inverse temperature in mol/kJ
+    pairs : ndarray
+        Host and guest types to calculate the binding probability for
+    pb_len : integer
+        Length of the probability calculation list
+    pb_freq : integer
+        Frequency of probability calculation in steps
+    pb_buf : ndarray
+        Circular buffer of binding probabilities per pair
+    pb_cnt : ndarray
+        Number of valid entries in the circular buffer per pair
+    pb_pos : ndarray
+        Next write position in the circular buffer per pair
+    pb_sum : ndarray
+        Rolling sum of the buffered probabilities per pair
+    pb_sumsq : ndarray
+        Rolling sum of squares of the buffered probabilities per pair
+
+    Returns
+    -------
+    acc_rej : tuple
+        Number of accepted and rejected moves in this segment
+    """
+    # Initialize
+    n_cells = cell_count.shape[0]
+    n_acc = 0
+    n_rej = 0
+
+    # Loop invariants
+    n_move = move_list.shape[0]
+    do_pb = pb_len > 0
+    n_pairs = pairs.shape[0]
+    last_step = steps_tot-1
+
+    # Run through MC steps
+    for step_id in range(steps):
+        step = step_0+step_id
+
+        # Choose random molecule
+        mol_id = move_list[np.random.randint(0, n_move)]
+        inst = type_inst[mol_id, np.random.randint(0, type_num[mol_id])]
+
+        # Choose random old and new position
+        pos_old = inst_cell[inst]
+        pos_new = np.random.randint(0, n_cells)
+
+        # Get occupancy
+        cnt_old = cell_count[pos_old]
+        cnt_new = cell_count[pos_new]
+
+        # Run through states
+        ## New cell is empty
+        if cnt_new == 0:
+            ### Old unbound
+            if cnt_old == 1:
+                is_accept = True
+            ### Old bound
+            else:
+                #### Check unbinding
+                t_a = inst_mol[cell_slots[pos_old, 0]]
+                t_b = inst_mol[cell_slots[pos_old, 1]]
+                is_accept = _metropolis_njit(-im[t_a, t_b], beta)
+        ## New Cell filled
+        else:
+            ### Only one molecule in new cell
+            if cnt_new == 1:
+                t_new = inst_mol[cell_slots[pos_new, 0]]
+                #### Old unbound
+                if cnt_old == 1:
+                    ##### Metropolis check binding, and interaction matrix if binding is possible (im > 0)
+                    if im[mol_id, t_new]:
+                        is_accept = _metropolis_njit(im[mol_id, t_new], beta)
+                    else:
+                        is_accept = False
+                #### Old bound
+                else:
+                    ##### Metropolis check unbinding and then binding
+                    t_a = inst_mol[cell_slots[pos_old, 0]]
+                    t_b = inst_mol[cell_slots[pos_old, 1]]
+                    if _metropolis_njit(-im[t_a, t_b], beta):
+                        is_accept = _metropolis_njit(im[mol_id, t_new], beta)
+                    else:
+                        is_accept = False
+            ### Complex in new cell
+            else:
+                is_accept = False
+
+        # Proccess acceptance
+        if is_accept:
+            n_acc += 1
+
+            # Remove instance from old cell
+            if cell_slots[pos_old, 0] == inst:
+                cell_slots[pos_old, 0] = cell_slots[pos_old, 1]
+            cell_slots[pos_old, 1] = -1
+            cell_count[pos_old] -= 1
+
+            # Add instance to new cell
+            cell_slots[pos_new, cell_count[pos_new]] = inst
+            cell_count[pos_new] += 1
+            inst_cell[inst] = pos_new
+        else:
+            n_rej += 1
+
+        # Calculate average binding probability
+        if do_pb and ((step+1)%pb_freq == 0 or step == 0 or step == last_step):
+            for p in range(n_pairs):
+                host = pairs[p, 0]
+                guest = pairs[p, 1]
+
+                # Calculate probability or carry over previous value
+                if is_accept or step <= 2:
+                    val = _count_bound(host, guest, inst_mol, inst_cell, cell_slots, cell_count, type_inst, type_num)
+                else:
+                    val = pb_buf[p, (pb_pos[p]-1)%pb_len] if pb_cnt[p] > 0 else 0.0
+
+                # Append to circular buffer and roll the window statistics
+                evict = pb_buf[p, pb_pos[p]] if pb_cnt[p] == pb_len else 0.0
+                pb_sum[p] += val-evict
+                pb_sumsq[p] += val*val-evict*evict
+
+                pb_buf[p, pb_pos[p]] = val
+                pb_pos[p] = (pb_pos[p]+1)%pb_len
+                if pb_cnt[p] < pb_len:
+                    pb_cnt[p] += 1
+
+    return n_acc, n_rej
+
+
+@njit(cache=True, nogil=True, fastmath=True, boundscheck=False, error_model="numpy", parallel=True)
+def _run_replicas(steps, seeds,
+                  inst_mol, inst_cell, cell_slots, cell_count,
+                  type_inst, type_num, move_list, im, beta,
+                  pairs, pb_len, pb_freq, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq):
+    """Run independent replicas of the same phase in parallel threads. Each
+    replica owns its leading slice of the stacked state arrays, so the
+    trajectories share no memory and scale with the number of cores.
+
+    Parameters
+    ----------
+    steps : integer
+        Number of MC steps per replica
+    seeds : ndarray
+        Random number generator seed per replica
+    inst_mol : ndarray
+        Molecule type of each molecule instance per replica
+    inst_cell : ndarray
+        Current cell of each molecule instance per replica
+    cell_slots : ndarray
+        Instance indices occupying each cell per replica, -1 for empty slots
+    cell_count : ndarray
+        Number of instances in each cell per replica
+    type_inst : ndarray
+        Instance indices of each molecule type
+    type_num : ndarray
+        Number of instances of each molecule type
+    move_list : ndarray
+        Movable molecule types
+    im : ndarray
+        Dense interaction matrix
+    beta : float
+        Inverse temperature in mol/kJ
+    pairs : ndarray
+        Host and guest types to calculate the binding probability for
+    pb_len : integer
+        Length of the probability calculation list
+    pb_freq : integer
+        Frequency of probability calculation in steps
+    pb_buf : ndarray
+        Circular buffer of binding probabilities per replica and pair
+    pb_cnt : ndarray
+        Number of valid entries in the circular buffer per replica and pair
+    pb_pos : ndarray
+        Next write position in the circular buffer per replica and pair
+    pb_sum : ndarray
+        Rolling sum of the buffered probabilities per replica and pair
+    pb_sumsq : ndarray
+        Rolling sum of squares of the buffered probabilities per replica and pair
+
+    Returns
+    -------
+    acc_rej : touple
+        Arrays with the number of accepted and rejected moves per replica
+    """
+    n_rep = seeds.shape[0]
+    n_acc = np.zeros(n_rep, dtype=np.int64)
+    n_rej = np.zeros(n_rep, dtype=np.int64)
+
+    for r in prange(n_rep):
+        np.random.seed(seeds[r])
+        acc, rej = _run_steps(steps, 0, steps,
+                              inst_mol[r], inst_cell[r], cell_slots[r], cell_count[r],
+                              type_inst, type_num, move_list, im, beta,
+                              pairs, pb_len, pb_freq, pb_buf[r], pb_cnt[r], pb_pos[r], pb_sum[r], pb_sumsq[r])
+        n_acc[r] = acc
+        n_rej[r] = rej
+
+    return n_acc, n_rej
+
+
+@njit(cache=True, nogil=True)
+def seed(value):
+    """Seed the random number generator of the compiled kernels for the
+    calling thread. Worker threads running independent systems should be
+    seeded separately so their random streams do not correlate.
+
+    Parameters
+    ----------
+    value : integer
+        Random number generator seed
+    """
+    np.random.seed(value)
+
+
+def warmup():
+    """Compile the MC kernels on a minimal one-molecule system. Called once
+    in the parent process before workers start, so every worker reuses the
+    cached compilation instead of triggering its own cold start.
+    """
+    inst_mol = np.zeros(1, dtype=np.int32)
+    inst_cell = np.zeros(1, dtype=np.int32)
+    cell_slots = np.full((2, 2), -1, dtype=np.int32)
+    cell_slots[0, 0] = 0
+    cell_count = np.zeros(2, dtype=np.int32)
+    cell_count[0] = 1
+    type_inst = np.zeros((1, 1), dtype=np.int32)
+    type_num = np.ones(1, dtype=np.int32)
+    move_list = np.zeros(1, dtype=np.int32)
+    im = np.zeros((1, 1), dtype=np.float64)
+    pairs = np.zeros((1, 2), dtype=np.int32)
+    pb_buf = np.zeros((1, 1), dtype=np.float64)
+    pb_cnt = np.zeros(1, dtype=np.int64)
+    pb_pos = np.zeros(1, dtype=np.int64)
+    pb_sum = np.zeros(1, dtype=np.float64)
+    pb_sumsq = np.zeros(1, dtype=np.float64)
+
+    seed(np.random.randint(2147483647))
+    _run_steps(1, 0, 1, inst_mol, inst_cell, cell_slots, cell_count,
+               type_inst, type_num, move_list, im, 1.0,
+               pairs, 1, 1, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq)
+
 
 class MC:
     """This class run a Monte Carlo algorithm in order to calculate the
     probability of complex creating between two molecules.
 
+    The interaction matrix and the molecule numbers per type are converted
+    into dense arrays once at construction, so the simulation kernels never
+    touch the underlying dictionaries.
+
     Parameters
     ----------
     box : Box
         Theoretical box system
     temp : float
         Simulation temperature in Kelvin
+    im : ndarray, optional
+        Dense interaction matrix, built from the box if not given
+    seed_val : integer, None, optional
+        Seed for the kernel random number generator, None for a random seed
     """
-    def __init__(self, box, temp):
+    def __init__(self, box, temp, im=None, seed_val=None):
+        if seed_val is not None:
+            seed(seed_val)
+
         self._box = box
         self._mols = box.get_mols()
         self._im = box.get_im()
 
+        self._im_arr = np.asarray(im, dtype=np.float64) if im is not None else box.get_im_array()
+
         self._temp = temp  # K
-        self._beta = 1/8.314e-3/temp  # kJ/mol
+        self._beta = 1/KB/temp  # mol/kJ
 
         self._move_list = [key for key, mol in self._mols.items() if mol["is_move"]]
         self._lattice = {x: [] for x in range(box.get_cells())}
@@ -41,6 +400,9 @@ class MC:
                 self._occupied[mol_id].append(cell_id)
                 cell_id += 1
 
+        # Pack the primary state arrays
+        self._pack()
+
     def _move(self, mol_id, old, new):
         """Move molecule from an old cell to a new cell.
 
@@ -61,6 +423,20 @@ class MC:
         self._occupied[mol_id].remove(old)
         self._occupied[mol_id].append(new)
 
+        # Update state arrays - find the moved instance in the old cell
+        for slot in range(2):
+            inst = self._cell_slots[old, slot]
+            if inst >= 0 and self._inst_mol[inst] == mol_id:
+                if self._cell_slots[old, 0] == inst:
+                    self._cell_slots[old, 0] = self._cell_slots[old, 1]
+                self._cell_slots[old, 1] = -1
+                self._cell_count[old] -= 1
+
+                self._cell_slots[new, self._cell_count[new]] = inst
+                self._cell_count[new] += 1
+                self._inst_cell[inst] = new
+                break
+
     def _metropolis(self, dE):
         """Performs the acceptance criterion of the Metropolis–Hastings
         algorithm.
@@ -75,14 +451,65 @@ class MC:
         accepted : bool
             True if move is accepted
         """
-        # Choose random number
-        rand = random.uniform(0, 1)
-
-        # Check metropolis
+        # Check metropolis - same criterion and random source as the kernel
         if dE <= 0:
             return True
         else:
-            return rand < min(1, np.exp(-self._beta*dE))
+            return np.log(np.random.random()) < -self._beta*dE
+
+    def _pack(self):
+        """Pack the lattice and occupancy dictionaries into the flat state
+        arrays used by the compiled kernel. These arrays are the primary
+        simulation state and are kept in sync by :func:`_move`.
+        """
+        # Initialize
+        n_types = len(self._mols)
+        n_cells = len(self._lattice)
+        nums = [len(self._occupied[mol_id]) for mol_id in range(n_types)]
+
+        # Molecule instances
+        inst_mol = np.empty(sum(nums), dtype=np.int32)
+        inst_cell = np.empty(sum(nums), dtype=np.int32)
+        type_inst = np.full((n_types, max(nums) if nums else 0), -1, dtype=np.int32)
+        type_num = np.array(nums, dtype=np.int32)
+
+        inst = 0
+        for mol_id in range(n_types):
+            for i, cell_id in enumerate(self._occupied[mol_id]):
+                inst_mol[inst] = mol_id
+                inst_cell[inst] = cell_id
+                type_inst[mol_id, i] = inst
+                inst += 1
+
+        # Cell occupancy
+        cell_slots = np.full((n_cells, 2), -1, dtype=np.int32)
+        cell_count = np.zeros(n_cells, dtype=np.int32)
+        for inst in range(inst_mol.shape[0]):
+            cell_id = inst_cell[inst]
+            cell_slots[cell_id, cell_count[cell_id]] = inst
+            cell_count[cell_id] += 1
+
+        # Set state arrays
+        self._inst_mol = inst_mol
+        self._inst_cell = inst_cell
+        self._cell_slots = cell_slots
+        self._cell_count = cell_count
+        self._type_inst = type_inst
+        self._type_num = type_num
+        self._move_arr = np.array(self._move_list, dtype=np.int32)
+
+    def _unpack(self):
+        """Write the state arrays back into the lattice and occupancy
+        dictionaries.
+        """
+        self._lattice = {x: [] for x in range(len(self._lattice))}
+        self._occupied = {x: [] for x in self._mols.keys()}
+
+        for inst in range(self._inst_mol.shape[0]):
+            mol_id = int(self._inst_mol[inst])
+            cell_id = int(self._inst_cell[inst])
+            self._lattice[cell_id].append(mol_id)
+            self._occupied[mol_id].append(cell_id)
 
     def _run_phase(self, steps, binding, pb_f, n_print, out, traj):
         """Run Monte Carlo algorithm for a number of steps.
@@ -102,101 +529,69 @@ class MC:
         traj : list
             Trajectory output file link and frequency in steps
         """
-        # Initialize
-        im = self._im
-        mols = self._mols
-        lattice = self._lattice
-        occupied = self._occupied
-
-        # Output format
-        out_form = "%"+str(len(str(steps)))+"i"
-
         # Acceptance numbers
         n_acc = 0
         n_rej = 0
 
         # Binding probability
-        p_b = {(x["host"], x["guest"]): [] for x in binding}
-
-        # Run through MC steps
-        for step_id in range(steps):
-            # Choose random molecule
-            mol_id = random.choice(self._move_list)
-
-            # Choose random old and new position
-            pos_old = random.choice(occupied[mol_id])
-            pos_new = random.choice(list(lattice.keys()))
-
-            # Get occupancy
-            cell_old = lattice[pos_old]
-            cell_new = lattice[pos_new]
-
-            # Run through states
-            ## New cell is empty
-            if not cell_new:
-                ### Old unbound
-                if len(cell_old) == 1:
-                    is_accept = True
-                ### Old bound
-                else:
-                    #### Check unbinding
-                    is_accept = self._metropolis(-im[cell_old[0]][cell_old[1]])
-            ## New Cell filled
-            else:
-                ### Only one molecule in new cell
-                if len(cell_new) == 1:
-                    #### Old unbound
-                    if len(cell_old) == 1:
-                        ##### Metropolis check binding, and interaction matrix if binding is possible (im > 0)
-                        if im[mol_id][cell_new[0]]:
-                            is_accept = self._metropolis(im[mol_id][cell_new[0]])
-                        else:
-                            is_accept = False
-                    #### Old bound
-                    else:
-                        ##### Metropolis check unbinding and then binding
-                        if self._metropolis(-im[cell_old[0]][cell_old[1]]):
-                            is_accept = self._metropolis(im[mol_id][cell_new[0]])
-                        else:
-                            is_accept = False
-                ### Complex in new cell
-                else:
-                    is_accept = False
-
-            # Proccess acceptance
-            if is_accept:
-                n_acc += 1
-                self._move(mol_id, pos_old, pos_new)
-            else:
-                n_rej += 1
-
-            # Calculate average binding probability
-            if pb_f[0] and ((step_id+1)%pb_f[1]==0 or step_id==0 or step_id==steps-1):
-                for host, guest in list(p_b.keys()):
-                    if len(p_b[(host, guest)])==pb_f[0]:
-                        p_b[(host, guest)].pop(0)
-                    p_b[(host, guest)].append(0)
-
-                    if is_accept or step_id<=2:
-                        for cell in list(set(occupied[host])):
-                            if host in lattice[cell] and guest in lattice[cell]:
-                                p_b[(host, guest)][-1] += 1
-                        p_b[(host, guest)][-1] /= mols[host]["num"]
-                    else:
-                        p_b[(host, guest)][-1] += p_b[(host, guest)][-2]
+        pairs = np.array([[x["host"], x["guest"]] for x in binding], dtype=np.int32)
+        pb_len = pb_f[0] if pb_f[0] else 0
+        pb_freq = pb_f[1] if pb_len else 0
+        pb_buf = np.zeros((pairs.shape[0], max(pb_len, 1)), dtype=np.float64)
+        pb_cnt = np.zeros(pairs.shape[0], dtype=np.int64)
+        pb_pos = np.zeros(pairs.shape[0], dtype=np.int64)
+        pb_sum = np.zeros(pairs.shape[0], dtype=np.float64)
+        pb_sumsq = np.zeros(pairs.shape[0], dtype=np.float64)
+
+        # Output template - built once per phase, filled per print
+        out_temp = "{:"+str(len(str(steps)))+"d}/"+str(steps)+"  - acc/rej={:.3f}"
+        for p in range(pairs.shape[0]):
+            out_temp += ", p_b("+str(pairs[p, 0])+","+str(pairs[p, 1])+")={:.4f}+-{:.4f}"
+        out_temp += "\r"
+
+        # Determine print boundaries - a zero-length phase runs zero steps
+        if n_print and steps:
+            bounds = [1]+list(range(n_print, steps+1, n_print))
+            bounds += [steps] if bounds[-1] < steps else []
+        else:
+            bounds = [steps]
+
+        # Run through segments
+        step = 0
+        for bound in bounds:
+            acc, rej = _run_steps(bound-step, step, steps,
+                                  self._inst_mol, self._inst_cell, self._cell_slots, self._cell_count,
+                                  self._type_inst, self._type_num, self._move_arr, self._im_arr, self._beta,
+                                  pairs, pb_len, pb_freq, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq)
+            n_acc += acc
+            n_rej += rej
+            step = bound
 
             # Progress
-            if n_print and ((step_id+1)%n_print==0 or step_id==0 or step_id==steps-1):
-                out_string = out_form%(step_id+1)+"/"+out_form%steps
-                out_string += "  - acc/rej="+"%.3f"%(n_acc/n_rej if n_rej>0 else 0) # +" "+str(n_acc)+" "+str(n_rej)
-                for host, guest in list(p_b.keys()):
-                    out_string += ", p_b("+str(host)+","+str(guest)+")="+"%.4f"%np.mean(p_b[(host, guest)])+"+-"+"%.4f"%np.std(p_b[(host, guest)])
-                sys.stdout.write(out_string+"\r")
+            if n_print:
+                vals = [step, n_acc/n_rej if n_rej>0 else 0]
+                for p in range(pairs.shape[0]):
+                    num = pb_cnt[p] if pb_cnt[p] else 1
+                    mean = pb_sum[p]/num
+                    vals += [mean, np.sqrt(max(pb_sumsq[p]/num-mean*mean, 0))]
+                sys.stdout.write(out_temp.format(*vals))
                 sys.stdout.flush()
 
         if n_print:
             print()
 
+        # Write state back to dictionaries
+        self._unpack()
+
+        # Convert circular buffers to binding probability lists
+        p_b = {}
+        for p, pair in enumerate(binding):
+            key = (pair["host"], pair["guest"])
+            if pb_cnt[p] < pb_len:
+                p_b[key] = pb_buf[p, :pb_cnt[p]].tolist()
+            else:
+                p_b[key] = np.roll(pb_buf[p], -pb_pos[p]).tolist()
+
         return {"p_b": p_b, "n_acc": n_acc, "n_rej": n_rej}
 
     def run(self, steps_equi, steps_prod, binding=[{"host": 0, "guest": 1}], pb_f=[1000, 100], n_print=1000, out=["", 0], traj=["", 0]):
@@ -228,3 +623,83 @@ class MC:
         if n_print:
             print("Running production phase ...")
         return self._run_phase(steps_prod, binding, pb_f, n_print, out, traj)
+
+    def finalize(self):
+        """Return the occupied cells of each molecule type in sorted order.
+        The cells are gathered from the packed state arrays and sorted in one
+        vectorized pass per type.
+
+        Returns
+        -------
+        occupied : list
+            Sorted array of occupied cells per molecule type
+        """
+        return [np.sort(self._inst_cell[self._type_inst[mol_id, :self._type_num[mol_id]]]) for mol_id in range(len(self._mols))]
+
+    def run_replicas(self, steps_equi, steps_prod, num_rep, binding=[{"host": 0, "guest": 1}], pb_f=[1000, 100]):
+        """Run independent replicas of the Monte Carlo algorithm in parallel
+        threads, e.g. for estimating error bars on the binding probability.
+        Each replica starts from the current box state with its own seed and
+        runs on a private copy of the state arrays, so the state of this
+        object is left untouched.
+
+        Parameters
+        ----------
+        steps_equi : integer
+            Number of MC steps in the equilibration phase
+        steps_prod : integer
+            Number of MC steps in the production phase
+        num_rep : integer
+            Number of replicas
+        binding : list, optional
+            Systems to calculate the binding probability for
+        pb_f : list, optional
+            Length and frequency of probability calculation list
+
+        Returns
+        -------
+        results : list
+            Output dictionary of each replica containing the binding
+            probabilities **p_b** and the number of accepted **n_acc** and
+            rejected **n_rej** moves
+        """
+        # Stack a private copy of the mutable state per replica
+        inst_mol = np.repeat(self._inst_mol[None, :], num_rep, axis=0)
+        inst_cell = np.repeat(self._inst_cell[None, :], num_rep, axis=0)
+        cell_slots = np.repeat(self._cell_slots[None, :, :], num_rep, axis=0)
+        cell_count = np.repeat(self._cell_count[None, :], num_rep, axis=0)
+
+        # Binding probability
+        pairs = np.array([[x["host"], x["guest"]] for x in binding], dtype=np.int32)
+        pb_len = pb_f[0] if pb_f[0] else 0
+        pb_freq = pb_f[1] if pb_len else 0
+        pb_buf = np.zeros((num_rep, pairs.shape[0], max(pb_len, 1)), dtype=np.float64)
+        pb_cnt = np.zeros((num_rep, pairs.shape[0]), dtype=np.int64)
+        pb_pos = np.zeros((num_rep, pairs.shape[0]), dtype=np.int64)
+        pb_sum = np.zeros((num_rep, pairs.shape[0]), dtype=np.float64)
+        pb_sumsq = np.zeros((num_rep, pairs.shape[0]), dtype=np.float64)
+
+        # Run equilibration and production phase with independent seeds
+        seeds = np.random.randint(2147483647, size=2*num_rep)
+        _run_replicas(steps_equi, seeds[:num_rep],
+                      inst_mol, inst_cell, cell_slots, cell_count,
+                      self._type_inst, self._type_num, self._move_arr, self._im_arr, self._beta,
+                      pairs, 0, 0, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq)
+        n_acc, n_rej = _run_replicas(steps_prod, seeds[num_rep:],
+                                     inst_mol, inst_cell, cell_slots, cell_count,
+                                     self._type_inst, self._type_num, self._move_arr, self._im_arr, self._beta,
+                                     pairs, pb_len, pb_freq, pb_buf, pb_cnt, pb_pos, pb_sum, pb_sumsq)
+
+        # Convert circular buffers to binding probability lists
+        results = []
+        for r in range(num_rep):
+            p_b = {}
+            for p, pair in enumerate(binding):
+                key = (pair["host"], pair["guest"])
+                if pb_cnt[r, p] < pb_len:
+                    p_b[key] = pb_buf[r, p, :pb_cnt[r, p]].tolist()
+                else:
+                    p_b[key] = np.roll(pb_buf[r, p], -pb_pos[r, p]).tolist()
+            results.append({"p_b": p_b, "n_acc": int(n_acc[r]), "n_rej": int(n_rej[r])})
+
+        return results
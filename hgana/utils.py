@@ -5,9 +5,15 @@
 ################################################################################
 
 
+import io
 import os
+import mmap
 import time
 import pickle
+import functools
+
+import numpy as np
+import pandas as pd
 
 
 def mkdirp(directory):
@@ -38,6 +44,10 @@ def column(data):
     num_row = len(data)
     num_col = len(data[0])
 
+    # Rectangular matrices transpose in one C level pass
+    if all(len(row) == num_col for row in data):
+        return np.asarray(data).T.tolist()
+
     data_col = [[] for i in range(num_col)]
 
     for i in range(num_row):
@@ -47,6 +57,56 @@ def column(data):
     return data_col
 
 
+@functools.lru_cache(maxsize=8)
+def _read_colvar_cached(link, usecols, mtime, size):
+    """Parse the requested columns of a COLVAR file into a float array."""
+    cols = list(usecols) if usecols is not None else None
+
+    # The tokenizer only knows one comment character, so xvg style '@' lines
+    # are detected with a byte scan over the mapped file and stripped before
+    # parsing only when present
+    with open(link, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"@") == -1:
+                data = None
+            else:
+                data = b"".join(line for line in mm[:].splitlines(keepends=True) if not b"@" in line)
+
+    source = io.BytesIO(data) if data is not None else link
+    out = pd.read_csv(source, sep=r"\s+", comment="#", header=None, usecols=cols, dtype=np.float64, memory_map=data is None).values
+
+    # The array is shared between all callers - guard it against accidental
+    # in-place modification
+    out.flags.writeable = False
+
+    return out
+
+
+def read_colvar(link, usecols=None):
+    """Read a COLVAR file generated by PLUMED into a float matrix. Since
+    several analysis functions are commonly run on the same file, the parsed
+    array is cached keyed on the file path, modification time and size, so
+    repeated reads skip the parse entirely. The returned array is shared and
+    should not be modified in place.
+
+    Parameters
+    ----------
+    link : string
+        Link to COLVAR file generated by PLUMED
+    usecols : list, None, optional
+        Column ids to read, None for all columns
+
+    Returns
+    -------
+    data : ndarray
+        Parsed data matrix
+    """
+    stat = os.stat(link)
+    cols = tuple(usecols) if usecols is not None else None
+
+    return _read_colvar_cached(link, cols, stat.st_mtime_ns, stat.st_size)
+
+
 def tic():
     """MATLAB tic replica - return current time.
 
@@ -98,7 +158,7 @@ def save(obj, link):
         Specific link to save object
     """
     with open(link, "wb") as f:
-        pickle.dump(obj, f)
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 
 def load(link):
@@ -156,7 +216,7 @@ def mumol_m2_to_mols(c, A):
     N : float
         Number of molecules
     """
-    return 0.6022*c*A
+    return 0.6022*np.asarray(c)*A
 
 
 def mols_to_mumol_m2(N, A):
@@ -196,7 +256,7 @@ def mols_to_mumol_m2(N, A):
     c : float
         Concentration in :math:`\\frac{\\mu\\text{mol}}{\\text{m}^2}`
     """
-    return N/0.6022/A
+    return np.asarray(N)/0.6022/A
 
 
 def mmol_g_to_mumol_m2(c, A):
@@ -222,7 +282,7 @@ def mmol_g_to_mumol_m2(c, A):
     c : float
         Concentration in :math:`\\frac{\\mu\\text{mol}}{\\text{m}^2}`
     """
-    return c/A*1e3
+    return np.asarray(c)/A*1e3
 
 
 def mmol_l_to_mols(c, V):
@@ -262,7 +322,7 @@ def mmol_l_to_mols(c, V):
     N : float
         Number of molecules
     """
-    return 6.022e-4*c*V
+    return 6.022e-4*np.asarray(c)*V
 
 
 def mols_to_mmol_l(N, V):
@@ -301,4 +361,4 @@ def mols_to_mmol_l(N, V):
     c : float
         Concentration in :math:`\\frac{\\text{mmol}}{\\text{l}}`
     """
-    return N/6.022e-4/V
+    return np.asarray(N)/6.022e-4/V
@@ -20,17 +20,8 @@ class UserModelCase(unittest.TestCase):
         if os.path.isdir("tests"):
             os.chdir("tests")
 
-        folder = 'output'
-        hga.utils.mkdirp(folder)
-        hga.utils.mkdirp(folder+"/temp")
-        open(folder+"/temp.txt", 'a').close()
-
-        for filename in os.listdir(folder):
-            file_path = os.path.join(folder, filename)
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
+        shutil.rmtree("output", ignore_errors=True)
+        os.makedirs("output", exist_ok=True)
 
         # Set style
         sns.set_style("white", {"xtick.bottom": True, 'ytick.left': True})
@@ -112,16 +103,17 @@ class UserModelCase(unittest.TestCase):
 
         # Calculate binding affinity through association and dissociation rates
         print()
-        tables = [hga.affinity.time("output/count.obj", 298.15, 31.3707e-27, dt) for dt in [100*x for x in range(11)]]
-        table = pd.concat(tables)
+        sample = hga.utils.load("output/count.obj")
+        rows = [hga.affinity.time(sample, 298.15, 31.3707e-27, dt, is_df=False) for dt in [100*x for x in range(11)]]
+        table = pd.DataFrame(rows)
         self.assertEqual(round(table.iloc[0]["dG (kJ/mol)"], 4), -12.7998)
         self.assertEqual(round(table.iloc[0]["dG (kcal/mol)"], 4), -3.0575)
         print(table)
 
         # Test standard deviation
         print()
-        tables = [hga.affinity.time("output/count.obj", 298.15, 31.3707e-27, dt, is_std=True) for dt in [100*x for x in range(11)]]
-        table = pd.concat(tables)
+        rows = [hga.affinity.time(sample, 298.15, 31.3707e-27, dt, is_std=True, is_df=False) for dt in [100*x for x in range(11)]]
+        table = pd.DataFrame(rows)
         print(table)
 
         # Filter data
@@ -190,17 +182,19 @@ class UserModelCase(unittest.TestCase):
 
         # Run
         mc.run(100000, 100000, binding=[{"host": 0, "guest": 1}], pb_f=[1000, 50], n_print=1000)
-        for occ in mc._occupied.values():
-            occ.sort()
+        for occ in mc.finalize():
             print(occ)
 
+        # Run independent replicas in parallel
+        results = mc.run_replicas(10000, 10000, 4, binding=[{"host": 0, "guest": 1}], pb_f=[100, 50])
+        self.assertEqual(len(results), 4)
+
         # Add Inhibitor
         box.add_mol(10)
         box.set_interaction(0, 2, -10)
         mc = hga.MC(box, 298)
         mc.run(100000, 100000, binding=[{"host": 0, "guest": 1}, {"host": 0, "guest": 2}], pb_f=[1000, 50], n_print=1000)
-        for occ in mc._occupied.values():
-            occ.sort()
+        for occ in mc.finalize():
             print(occ)
 
     def test_ads(self):